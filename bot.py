@@ -2,9 +2,16 @@
 import os
 import time
 import json
+import random
 import hmac
 import hashlib
-import requests
+import functools
+import operator
+import urllib.parse
+import urllib.request
+import urllib3
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 """
@@ -21,9 +28,69 @@ from datetime import datetime, timezone
 
 API_HOST = "https://api.gateio.ws"
 API_PREFIX = "/api/v4"
+API_BASE = API_HOST + API_PREFIX
 
 CONFIG_FILE = "config.json"
 
+# SHA-512 пустого тела: GET-запросы подписываются без тела, считаем один раз
+EMPTY_BODY_SHA512 = hashlib.sha512(b"").hexdigest()
+_METHOD_BYTES = {"GET": b"GET", "POST": b"POST"}
+_GET_SIGN_PREFIX = b"GET\n" + API_PREFIX.encode("ascii")
+_EMPTY_BODY_SHA512_BYTES = EMPTY_BODY_SHA512.encode("ascii")
+
+# шаблоны заголовков: копируем вместо сборки словаря на каждый запрос
+_ACCEPT_HEADERS = {"Accept": "application/json"}
+_SIGNED_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+
+
+def _make_pool():
+    """
+    Пул соединений с теми же сетевыми настройками, что были у requests:
+    - прокси из HTTPS_PROXY/ALL_PROXY (с учётом NO_PROXY и user:pass@ в адресе);
+    - сертификаты из REQUESTS_CA_BUNDLE/CURL_CA_BUNDLE/SSL_CERT_FILE,
+      иначе certifi, если пакет установлен, иначе системные.
+    """
+    kw = dict(
+        num_pools=2,
+        maxsize=16,
+        headers=_ACCEPT_HEADERS,
+        timeout=10,
+        retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    ca_bundle = next(
+        (os.environ[k] for k in ("REQUESTS_CA_BUNDLE", "CURL_CA_BUNDLE", "SSL_CERT_FILE") if os.environ.get(k)),
+        None,
+    )
+    if ca_bundle:
+        kw["ca_certs"] = ca_bundle
+    else:
+        try:
+            import certifi
+        except ImportError:
+            pass
+        else:
+            kw["ca_certs"] = certifi.where()
+
+    proxies = urllib.request.getproxies()
+    proxy = proxies.get("https") or proxies.get("all")
+    if not proxy or urllib.request.proxy_bypass(API_HOST.split("://", 1)[1]):
+        return urllib3.PoolManager(**kw)
+
+    parsed = urllib3.util.parse_url(proxy)
+    if parsed.scheme not in ("http", "https"):
+        print(f"Прокси {parsed.scheme}:// не поддерживается (нужен http:// или https://), подключаемся напрямую.")
+        return urllib3.PoolManager(**kw)
+    if parsed.auth:
+        user, _, password = parsed.auth.partition(":")
+        kw["proxy_headers"] = urllib3.make_headers(
+            proxy_basic_auth=f"{urllib.parse.unquote(user)}:{urllib.parse.unquote(password)}"
+        )
+    return urllib3.ProxyManager(proxy, **kw)
+
+
+# Один пул на весь процесс: TCP/TLS соединение переиспользуется между запросами
+POOL = _make_pool()
+
 
 # ---------- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ----------
 
@@ -41,54 +108,113 @@ def load_config():
     return cfg
 
 
-def gen_sign(method: str, url: str, query_string: str = "", body: str = "", api_key: str = "", api_secret: str = ""):
+@functools.lru_cache(maxsize=4)
+def _hmac_template(api_secret: str):
+    # секрет не меняется за время работы – ключ (ipad/opad) готовим один раз,
+    # а для каждой подписи копируем уже инициализированное состояние
+    return hmac.new(api_secret.encode("utf-8"), digestmod=hashlib.sha512)
+
+
+def _hmac_sha512_hex(api_secret: str, sign_str: bytes) -> str:
+    h = _hmac_template(api_secret).copy()
+    h.update(sign_str)
+    return h.hexdigest()
+
+
+def _signed_headers(api_key: str, t: str, sign: str):
+    headers = _SIGNED_HEADERS.copy()
+    headers["KEY"] = api_key
+    headers["Timestamp"] = t
+    headers["SIGN"] = sign
+    return headers
+
+
+def gen_sign(method: str, url: str, query_string: str = "", body="", api_key: str = "", api_secret: str = ""):
     """
     Реализация из раздела Authentication в документации Gate API.
     """
     t = str(int(time.time()))
-    body_hash = hashlib.sha512(body.encode("utf-8")).hexdigest()
-    sign_str = "\n".join([method.upper(), API_PREFIX + url, query_string, body_hash, t])
-    sign = hmac.new(
-        api_secret.encode("utf-8"),
-        sign_str.encode("utf-8"),
-        hashlib.sha512
-    ).hexdigest()
-    headers = {
-        "KEY": api_key,
-        "Timestamp": t,
-        "SIGN": sign,
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-    return headers
+    # GET без тела подписывает _sign_get; сюда приходят запросы с телом
+    body_hash = hashlib.sha512(body.encode("utf-8") if isinstance(body, str) else body).hexdigest()
+    # все части строки подписи ASCII – собираем её сразу в bytes
+    sign_str = b"\n".join((
+        _METHOD_BYTES.get(method) or method.upper().encode("ascii"),
+        (API_PREFIX + url).encode("ascii"),
+        query_string.encode("utf-8"),
+        body_hash.encode("ascii"),
+        t.encode("ascii"),
+    ))
+    return _signed_headers(api_key, t, _hmac_sha512_hex(api_secret, sign_str))
+
+
+def _sign_get(url: str, query_string: str, api_key: str, api_secret: str):
+    """
+    То же, что gen_sign("GET", url, query_string, "", ...), но без ветвлений:
+    у GET тела нет, его хеш и префикс строки подписи заранее в bytes.
+    """
+    t = str(int(time.time()))
+    sign_str = b"\n".join((
+        _GET_SIGN_PREFIX + url.encode("ascii"),
+        query_string.encode("utf-8"),
+        _EMPTY_BODY_SHA512_BYTES,
+        t.encode("ascii"),
+    ))
+    return _signed_headers(api_key, t, _hmac_sha512_hex(api_secret, sign_str))
+
+
+class GateHTTPError(RuntimeError):
+    """Ответ Gate API с HTTP-статусом >= 400."""
+
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status} от Gate API: {body}")
+        self.status = status
+
+
+def _raise_for_status(r):
+    if r.status >= 400:
+        raise GateHTTPError(r.status, r.data.decode("utf-8", "replace"))
 
 
 def http_get(url, query="", api_key=None, api_secret=None, auth=False):
-    full_url = API_HOST + API_PREFIX + url
-    headers = {"Accept": "application/json"}
+    full_url = API_BASE + url
+    headers = None  # без подписи – заголовки пула по умолчанию (_ACCEPT_HEADERS)
     if auth:
-        headers = gen_sign("GET", url, query, "", api_key, api_secret)
+        headers = _sign_get(url, query, api_key, api_secret)
     if query:
         full_url += "?" + query
-    r = requests.get(full_url, headers=headers, timeout=10)
-    r.raise_for_status()
-    return r.json()
+    r = POOL.request("GET", full_url, headers=headers)
+    _raise_for_status(r)
+    return json.loads(r.data)
 
 
 def http_post(url, body_dict, query="", api_key=None, api_secret=None):
-    body = json.dumps(body_dict, separators=(",", ":"))
+    # тело кодируем в bytes один раз: эти же байты хешируются в подписи и уходят в запрос
+    body = json.dumps(body_dict, separators=(",", ":")).encode("utf-8")
     headers = gen_sign("POST", url, query, body, api_key, api_secret)
-    full_url = API_HOST + API_PREFIX + url
+    full_url = API_BASE + url
     if query:
         full_url += "?" + query
-    r = requests.post(full_url, headers=headers, data=body, timeout=10)
-    r.raise_for_status()
-    return r.json()
+    r = POOL.request("POST", full_url, headers=headers, body=body)
+    _raise_for_status(r)
+    return json.loads(r.data)
 
 
 # ---------- ЛОГИКА DUAL INVESTMENT ----------
 
-def find_best_eth_dual_one_day():
+_ONE_DAY = 24 * 60 * 60
+_ONGOING, _PUT, _USDT, _ETH = "ONGOING", "put", "USDT", "ETH"
+_BEST_PLAN_TTL_SEC = 60
+_best_plan_cache = {"ts": 0, "plan": None}
+
+
+def _parse_apy(p):
+    try:
+        return float(p.get("apy_display", "0"))
+    except ValueError:
+        return 0.0
+
+
+def find_best_eth_dual_one_day(now=None):
     """
     1) Берём список всех Dual Investment
     2) Фильтруем по:
@@ -98,38 +224,38 @@ def find_best_eth_dual_one_day():
        - status = ONGOING
        - срок ~1 день (по delivery_time)
     3) Выбираем с максимальным apy_display
+    Результат кешируется на _BEST_PLAN_TTL_SEC секунд.
+    now – текущее время (unix, int); если у вызывающего оно уже есть, передайте его.
     """
+    if now is None:
+        now = int(time.time())
+    cached = _best_plan_cache["plan"]
+    if cached is not None and now - _best_plan_cache["ts"] < _BEST_PLAN_TTL_SEC:
+        return cached
+
     plans = http_get("/earn/dual/investment_plan")
-    now = int(time.time())
-    one_day_sec = 24 * 60 * 60
+
+    # фильтр по сроку: от 0.5 до 2 дней от текущего момента
+    min_delivery = now + _ONE_DAY // 2
+    max_delivery = now + 2 * _ONE_DAY
 
     candidates = []
     for p in plans:
-        if p.get("invest_currency") != "USDT":
-            continue
-        if p.get("exercise_currency") != "ETH":
-            continue
-        if p.get("type") != "put":
-            continue
-        if p.get("status") != "ONGOING":
-            continue
-
-        delivery = int(p.get("delivery_time", 0))
-        # фильтр по сроку: от 0.5 до 2 дней от текущего момента
-        if not (0.5 * one_day_sec <= delivery - now <= 2.0 * one_day_sec):
-            continue
-
-        try:
-            apy = float(p.get("apy_display", "0"))
-        except ValueError:
-            apy = 0.0
-        p["_apy"] = apy
-        candidates.append(p)
+        get = p.get
+        # and обрывает проверку на первом несовпадении
+        if (get("status") == _ONGOING
+                and get("type") == _PUT
+                and get("invest_currency") == _USDT
+                and get("exercise_currency") == _ETH
+                and min_delivery <= int(get("delivery_time", 0)) <= max_delivery):
+            candidates.append((_parse_apy(p), p))
 
     if not candidates:
         raise RuntimeError("Не найдено подходящих Dual Investment по ETH/USDT (1 день).")
 
-    best = max(candidates, key=lambda x: x["_apy"])
+    best = max(candidates, key=operator.itemgetter(0))[1]
+    _best_plan_cache["ts"] = now
+    _best_plan_cache["plan"] = best
     return best
 
 
@@ -159,11 +285,13 @@ def get_futures_ticker(settle, contract):
 
 
 def get_futures_contract(settle, contract):
-    data = http_get(f"/futures/{settle}/contracts", "")
-    for c in data:
-        if c.get("name") == contract:
-            return c
-    raise RuntimeError(f"Не найден контракт {contract}")
+    # GET /futures/{settle}/contracts/{contract} отдаёт один контракт вместо всего списка
+    try:
+        return http_get(f"/futures/{settle}/contracts/{contract}", "")
+    except GateHTTPError as e:
+        if e.status == 404:
+            raise RuntimeError(f"Не найден контракт {contract}") from e
+        raise
 
 
 def calc_hedge_size_usdt(amount_dual_usdt, hedge_multiplier, exercise_price):
@@ -190,8 +318,15 @@ def calc_contract_size_from_usdt(notional_usdt, contract_info, mark_price):
             multiplier = float(contract_info["quanto_multiplier"])
         except ValueError:
             multiplier = 1.0
-
-    size = int(round(notional_usdt / multiplier))
+    # битый ответ API (0 или отрицательный множитель) не должен приводить к делению на ноль
+    if multiplier <= 0:
+        multiplier = 1.0
+
+    # округление half-up; при multiplier == 1 деление не нужно
+    if multiplier == 1.0:
+        size = int(notional_usdt + 0.5)
+    else:
+        size = int(notional_usdt / multiplier + 0.5)
     if size == 0:
         size = 1
     return size
@@ -227,14 +362,48 @@ def close_futures_short_market(settle, contract, api_key, api_secret):
 
 # ---------- МОНИТОРИНГ DUAL ORDER ----------
 
-def wait_for_dual_settlement(order_text, api_key, api_secret, poll_interval):
+_ORDER_FROM_SKEW_SEC = 60  # запас на расхождение локальных часов с сервером Gate для from=
+_SETTLE_BACKOFF_STEP_SEC = 5 * 60  # после экспирации пауза удваивается с таким шагом
+
+
+def _next_poll_delay(poll_interval, delivery_ts):
+    """
+    Пауза между опросами: чем ближе delivery_time, тем чаще (до 1 с),
+    после экспирации – от 5 с с удвоением до poll_interval. ±10% джиттера.
+    """
+    if delivery_ts is None:
+        delay = poll_interval
+    else:
+        remaining = delivery_ts - time.time()
+        if remaining > 0:
+            delay = max(1.0, min(poll_interval, remaining / 20))
+        else:
+            steps = int(-remaining // _SETTLE_BACKOFF_STEP_SEC)
+            delay = max(1.0, min(poll_interval, 5.0 * 2 ** min(steps, 16)))
+    return delay * random.uniform(0.9, 1.1)
+
+
+def wait_for_dual_settlement(order_text, api_key, api_secret, poll_interval, delivery_ts=None, created_ts=None):
     """
     Периодически опрашиваем GET /earn/dual/orders и ищем наш ордер по text.
     Возвращаем запись ордера после статуса SETTLEMENT_SUCCESS
+    delivery_ts / created_ts (unix) – задают частоту опроса и фильтр from=.
     """
     print("Ожидание экспирации Dual Investment...")
+    if created_ts is not None:
+        query = f"from={int(created_ts) - _ORDER_FROM_SKEW_SEC}&limit=100"
+    else:
+        query = ""
     while True:
-        orders = http_get("/earn/dual/orders", "", api_key, api_secret, auth=True)
+        delay = _next_poll_delay(poll_interval, delivery_ts)
+        try:
+            orders = http_get("/earn/dual/orders", query, api_key, api_secret, auth=True)
+        except (urllib3.exceptions.HTTPError, GateHTTPError, ValueError) as e:
+            # сетевой сбой, ошибочный статус или не-JSON ответ (например, HTML-страница
+            # прокси) не должны обрывать многочасовое ожидание
+            print(f"Ошибка запроса статуса ({e}). Повтор через {delay:.0f} с...")
+            time.sleep(delay)
+            continue
         target = None
         for o in orders:
             if o.get("text") == order_text:
@@ -247,7 +416,7 @@ def wait_for_dual_settlement(order_text, api_key, api_secret, poll_interval):
             print(f"Статус Dual Investment: {status}")
             if status == "SETTLEMENT_SUCCESS":
                 return target
-        time.sleep(poll_interval)
+        time.sleep(delay)
 
 
 def main():
@@ -258,8 +427,17 @@ def main():
     print("=== Gate Dual Investment + Futures Hedge бот ===")
     amount_usdt = float(input("Введите сумму вклада в Dual Investment (USDT): ").strip())
 
-    # 1. Находим лучший план
-    plan = find_best_eth_dual_one_day()
+    settle = cfg["futures_settle"]
+    contract = cfg["futures_contract"]
+
+    # 1. Параллельно находим лучший план и получаем инфо по фьючерсу и текущую цену
+    #    (запросы независимы, POOL потокобезопасен)
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        plan_f = ex.submit(find_best_eth_dual_one_day)
+        contract_f = ex.submit(get_futures_contract, settle, contract)
+        ticker_f = ex.submit(get_futures_ticker, settle, contract)
+        plan, contract_info, ticker = plan_f.result(), contract_f.result(), ticker_f.result()
+
     exercise_price = float(plan["exercise_price"])
     apy = float(plan.get("apy_display", "0"))
     delivery_ts = int(plan["delivery_time"])
@@ -275,11 +453,7 @@ def main():
     hedge_notional = calc_hedge_size_usdt(amount_usdt, cfg["hedge_multiplier"], exercise_price)
     print(f"\nПланируемый нотионал хеджа по фьючерсу: ~{hedge_notional:.2f} USDT")
 
-    # 3. Получаем инфо по фьючерсу и текущую цену
-    settle = cfg["futures_settle"]
-    contract = cfg["futures_contract"]
-    contract_info = get_futures_contract(settle, contract)
-    ticker = get_futures_ticker(settle, contract)
+    # 3. Размер фьючерсного шорта по текущей цене
     mark_price = float(ticker["last"])
 
     contract_size = calc_contract_size_from_usdt(hedge_notional, contract_info, mark_price)
@@ -290,7 +464,9 @@ def main():
         print("Отменено пользователем.")
         return
 
-    custom_text = f"dual-hedge-{int(time.time())}"
+    # created_ts – для wait_for_dual_settlement(..., created_ts=created_ts)
+    created_ts = int(time.time())
+    custom_text = f"dual-hedge-{created_ts}"
 
     # 4. Открываем Dual Investment
     dual_resp = place_dual_order(plan, amount_usdt, api_key, api_secret, custom_text)